@@ -0,0 +1,71 @@
+# check_importtime.py
+#
+# main.py の import 時間を `python -X importtime` で計測し、予算内か確認する。
+# - numpy / PIL が読み込まれていたら失敗（--help や引数チェックでは不要なため）
+# - 素の `python -c pass` からの増分（self 時間の合計）が --budget-ms を超えたら失敗
+#
+# 例: python check_importtime.py --budget-ms 60
+#     python check_importtime.py -- input.png output.png --skip-unchanged
+
+from __future__ import annotations
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ("numpy", "PIL")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(argv: list[str]) -> tuple[int, list[str]]:
+    """python -X importtime <argv> を実行し、(self 時間合計 [us], import されたモジュール名) を返す"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    total_us = 0
+    modules: list[str] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        total_us += int(m.group(1))
+        modules.append(m.group(4))
+    return total_us, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="main.py の import 時間チェック")
+    parser.add_argument("--budget-ms", type=float, default=75.0, help="起動時 import の増分の予算（ミリ秒）")
+    parser.add_argument("main_args", nargs="*", default=["--help"], help="main.py に渡す引数（既定: --help）")
+    args = parser.parse_args()
+
+    main_py = Path(__file__).with_name("main.py")
+    base_us, base_modules = measure(["-c", "pass"])
+    total_us, modules = measure([str(main_py), *args.main_args])
+    heavy = sorted({name for name in modules if name.split(".")[0] in HEAVY_MODULES})
+    total_ms = max(0, total_us - base_us) / 1000.0
+
+    print(
+        f"import time: +{total_ms:.1f} ms（予算 {args.budget_ms:.1f} ms）, "
+        f"modules: +{len(modules) - len(base_modules)}"
+    )
+    ok = True
+    if heavy:
+        print("NG: 重いモジュールが読み込まれています:", ", ".join(heavy))
+        ok = False
+    if total_ms > args.budget_ms:
+        print("NG: 予算超過")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
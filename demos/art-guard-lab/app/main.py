@@ -1,26 +1,113 @@
 from __future__ import annotations
 
 import argparse
+import json
 from pathlib import Path
 
-from PIL import Image
+# protect_filters は numpy / PIL を遅延読み込みするので、ここでの import は軽い。
+# --help・引数エラー・--skip-unchanged での早期終了では numpy / PIL を読み込まない。
+from protect_filters import protect_image, ProtectConfig, is_raw_path, load_raw, open_raw_output
 
-from protect_filters import protect_image, ProtectConfig
+
+def _parse_size(value: str) -> tuple[int, int]:
+    """'幅x高さ'（例: 1920x1080）をタプルに変換する"""
+    try:
+        w_s, h_s = value.lower().split("x")
+        w, h = int(w_s), int(h_s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"サイズは 幅x高さ で指定してください: {value}")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError(f"サイズは正の値で指定してください: {value}")
+    return w, h
+
+
+def _parse_ratio(value: str) -> float:
+    """0.0〜1.0 の実数として解釈する"""
+    try:
+        ratio = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"数値で指定してください: {value}")
+    if not 0.0 <= ratio <= 1.0:
+        raise argparse.ArgumentTypeError(f"0.0〜1.0 の範囲で指定してください: {value}")
+    return ratio
+
+
+def _params_path(output_path: Path) -> Path:
+    """--skip-unchanged 用の記録ファイル（出力と同じ場所の <出力名>.params.json）"""
+    return output_path.with_name(output_path.name + ".params.json")
+
+
+def _run_params(args: argparse.Namespace, input_path: Path) -> dict:
+    """出力内容を左右する引数と入力ファイルの状態"""
+    st = input_path.stat()
+    return {
+        "input": str(input_path.resolve()),
+        "input_mtime_ns": st.st_mtime_ns,
+        "input_size": st.st_size,
+        "mode": args.mode,
+        "strength": args.strength,
+        "mix": args.mix,
+        "size": list(args.size) if args.size else None,
+    }
+
+
+def _is_up_to_date(output_path: Path, params: dict) -> bool:
+    """前回の変換と入力・引数が同じで、出力がその後変更されていなければ True"""
+    try:
+        recorded = json.loads(_params_path(output_path).read_text(encoding="utf-8"))
+        output_mtime_ns = output_path.stat().st_mtime_ns
+    except (OSError, ValueError):
+        return False
+    return recorded == {**params, "output_mtime_ns": output_mtime_ns}
+
+
+def _record_params(output_path: Path, params: dict) -> None:
+    record = {**params, "output_mtime_ns": output_path.stat().st_mtime_ns}
+    _params_path(output_path).write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Art Guard Lab CLI Demo")
-    parser.add_argument("input", help="入力画像パス")
-    parser.add_argument("output", help="出力画像パス")
+    parser.add_argument("input", help="入力画像パス（.npy / .rgb / .raw はデコードせずマップして読む）")
+    parser.add_argument("output", help="出力画像パス（.npy / .rgb / .raw はエンコードせずマップして書く）")
     parser.add_argument("--mode", default="combo", choices=["fft", "jitter", "combo"], help="保護モード")
-    parser.add_argument("--strength", type=float, default=0.6, help="強さ（0.0〜1.0）")
-    parser.add_argument("--mix", type=float, default=0.9, help="オリジナルとのブレンド比（0.0〜1.0）")
+    parser.add_argument("--strength", type=_parse_ratio, default=0.6, help="強さ（0.0〜1.0）")
+    parser.add_argument("--mix", type=_parse_ratio, default=0.9, help="オリジナルとのブレンド比（0.0〜1.0）")
+    parser.add_argument("--size", type=_parse_size, help="ヘッダなし RGB 入力のサイズ（例: 1920x1080）")
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="前回と入力・引数が同じで出力も変わっていなければ変換をスキップする（<出力名>.params.json に記録）",
+    )
     args = parser.parse_args()
 
     input_path = Path(args.input)
     output_path = Path(args.output)
 
-    img = Image.open(input_path)
+    if not input_path.is_file():
+        parser.error(f"入力画像が見つかりません: {input_path}")
+    if is_raw_path(input_path) and input_path.suffix.lower() != ".npy" and args.size is None:
+        parser.error("ヘッダなし RGB 入力には --size 幅x高さ が必要です")
+    if is_raw_path(output_path) and output_path.exists() and output_path.samefile(input_path):
+        # 出力のマップは既存ファイルを切り詰めるので、入力を読む前に中身が消えてしまう
+        parser.error(f"生配列の出力先に入力と同じファイルは指定できません: {output_path}")
+
+    params = _run_params(args, input_path)
+    if args.skip_unchanged and _is_up_to_date(output_path, params):
+        print("変更なし（スキップ）:", output_path)
+        return
+
+    if is_raw_path(input_path):
+        try:
+            img = load_raw(input_path, size=args.size)
+        except ValueError as e:
+            parser.error(str(e))
+        height, width = img.shape[:2]
+    else:
+        from PIL import Image
+
+        img = Image.open(input_path)
+        width, height = img.size
 
     cfg = ProtectConfig(
         fft_strength=args.strength,
@@ -28,11 +115,19 @@ def main() -> None:
         mix_ratio=args.mix,
     )
 
-    result = protect_image(img, mode=args.mode, cfg=cfg)
-    result.save(output_path)
+    if is_raw_path(output_path):
+        # 出力先をマップし、フィルタ結果をそこへ書き込む（PNG などへのエンコードを挟まない）
+        out = open_raw_output(output_path, (height, width))
+        protect_image(img, mode=args.mode, cfg=cfg, out=out)
+    else:
+        result = protect_image(img, mode=args.mode, cfg=cfg)
+        result.save(output_path)
+
+    if args.skip_unchanged:
+        _record_params(output_path, params)
 
     print("変換完了:", output_path)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,45 +7,125 @@
 #
 # strength: 0.0 ~ 1.0 を想定（GUI のスライダー）
 # mix      : 0.0 ~ 1.0 を想定（combo でのブレンド比）
+#
+# 入力は PIL Image のほか、(H, W, 3) uint8 の ndarray / np.memmap も受け付ける。
+# .npy / ヘッダなし RGB ファイルは load_raw / open_raw_output でマップして渡す。
+#
+# numpy / PIL は初回アクセス時まで読み込まない（CLI の --help や引数チェックを軽くするため）。
 
 from __future__ import annotations
 
+import functools
+import importlib
 from dataclasses import dataclass
-from typing import Literal
+from pathlib import Path
+from types import ModuleType
+from typing import Literal, Union
+
+
+class _LazyModule(ModuleType):
+    """属性に初めて触れた時点で実体を import し、以降はその属性をそのまま使う"""
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
 
-import numpy as np
-from PIL import Image, ImageFilter, ImageOps
+np = _LazyModule("numpy")
+Image = _LazyModule("PIL.Image")
 
 
-def ensure_rgb(img: Image.Image) -> Image.Image:
+ImageLike = Union["Image.Image", "np.ndarray"]
+
+
+def ensure_rgb(img: ImageLike) -> Image.Image:
     """必ず RGB に統一（RGBA / L などが来ても防ぐ）"""
+    if isinstance(img, np.ndarray):
+        return Image.fromarray(as_rgb_array(img))
     if img.mode != "RGB":
         return img.convert("RGB")
     return img
 
 
+def as_rgb_array(img: ImageLike) -> np.ndarray:
+    """
+    (H, W, 3) uint8 の配列として取り出す。
+    ndarray / memmap はコピーせずそのまま返すので、マップ済みページを直接読める。
+    """
+    if isinstance(img, np.ndarray):
+        if img.ndim != 3 or img.shape[2] != 3 or img.dtype != np.uint8:
+            raise ValueError(f"(H, W, 3) uint8 の配列が必要です: shape={img.shape}, dtype={img.dtype}")
+        return img
+    return np.asarray(ensure_rgb(img))
+
+
 # ============================
 # 1. 高周波ノイズ系フィルタ
 # ============================
 
-def apply_highfreq(img: Image.Image, strength: float) -> Image.Image:
+# エッジ強度の計算はすべて整数で行う。
+# 輝度は R+G+B の合計（0〜765, int16）で持ち、中央差分（端は片側差分×2）を取ると
+#   dx = 2 * 255 * 3 * gx  （gx は 0〜1 グレーでの np.gradient と同じ値）
+# になるので、edge = clip(4 * sqrt(gx^2 + gy^2), 0, 1) = clip(sqrt(dx^2 + dy^2) / 382.5, 0, 1)。
+# dx^2 + dy^2 が 382.5^2 を超えると 1.0 で頭打ちなので、その範囲だけテーブル化する。
+_EDGE_SCALE = 382.5
+_EDGE_SQ_MAX = 146307  # ceil(382.5 ** 2)
+
+
+@functools.lru_cache(maxsize=1)
+def _edge_mask_lut() -> np.ndarray:
+    """dx^2 + dy^2 → マスク値（0.3〜1.0）の参照テーブル"""
+    sq = np.arange(_EDGE_SQ_MAX + 1, dtype=np.float64)
+    edge = np.minimum(np.sqrt(sq) / _EDGE_SCALE, 1.0)
+    return (0.3 + 0.7 * edge).astype(np.float32)
+
+
+def _edge_mask(rgb: np.ndarray) -> np.ndarray:
+    """
+    (H, W, 3) uint8 から、エッジほど大きくなるマスク（0.3〜1.0, float32, (H, W)）を作る。
+    float のグレー画像や勾配を作らず、int16 の差分と参照テーブルだけで求める。
+    """
+    # チャンネル軸での sum は遅いので、プレーンごとに足し込む
+    lum = rgb[..., 0].astype(np.int16)  # 0〜765
+    lum += rgb[..., 1]
+    lum += rgb[..., 2]
+
+    # 横方向・縦方向の差分（np.gradient と同じく内側は中央差分、端は片側差分）
+    dx = np.empty_like(lum)
+    dy = np.empty_like(lum)
+    np.subtract(lum[:, 2:], lum[:, :-2], out=dx[:, 1:-1])
+    np.subtract(lum[:, 1], lum[:, 0], out=dx[:, 0])
+    np.subtract(lum[:, -1], lum[:, -2], out=dx[:, -1])
+    dx[:, 0] *= 2
+    dx[:, -1] *= 2
+    np.subtract(lum[2:], lum[:-2], out=dy[1:-1])
+    np.subtract(lum[1], lum[0], out=dy[0])
+    np.subtract(lum[-1], lum[-2], out=dy[-1])
+    dy[0] *= 2
+    dy[-1] *= 2
+
+    sq = dx.astype(np.int32)
+    sq *= sq
+    dy32 = dy.astype(np.int32)
+    dy32 *= dy32
+    sq += dy32
+    np.minimum(sq, _EDGE_SQ_MAX, out=sq)
+
+    return np.take(_edge_mask_lut(), sq)
+
+
+def apply_highfreq(img: ImageLike, strength: float) -> Image.Image:
     """
     エッジ付近に強くノイズを乗せる高周波フィルタ。
     strength が大きいほどノイズが強くなる。
     """
-    img = ensure_rgb(img)
-    arr = np.asarray(img).astype(np.float32) / 255.0  # (H, W, 3)
+    rgb = as_rgb_array(img)
 
-    # グレースケールで簡易エッジ強度を計算
-    gray = arr.mean(axis=2)
-    gy, gx = np.gradient(gray)
-    edge_mag = np.sqrt(gx * gx + gy * gy)  # 0〜?（エッジが強いほど大きい）
-    edge_mag = np.clip(edge_mag * 4.0, 0.0, 1.0)  # 少し強調して 0〜1 に収める
+    # エッジほどノイズが強くなるようにマスク（0.3〜1.0 の範囲）
+    mask = _edge_mask(rgb)[..., None]  # (H, W, 1)
 
-    # エッジほどノイズが強くなるようにマスク
-    # 0.3〜1.0 の範囲にする
-    mask = 0.3 + 0.7 * edge_mag
-    mask = mask[..., None]  # (H, W, 1)
+    arr = rgb.astype(np.float32) / 255.0  # (H, W, 3)
 
     # strength に応じたノイズ量
     # 0.0 → 0, 1.0 → 標準偏差 0.2 くらい
@@ -64,22 +144,21 @@ def apply_highfreq(img: Image.Image, strength: float) -> Image.Image:
 # 2. ラインジッターフィルタ
 # ============================
 
-def apply_line_jitter(img: Image.Image, strength: float) -> Image.Image:
+def apply_line_jitter(img: ImageLike, strength: float) -> Image.Image:
     """
     行ごとに水平方向へランダムシフトをかける。
     線画や輪郭が「ゆらいで」見えるような効果。
 
     strength が大きいほどシフト量が増える。
     """
-    img = ensure_rgb(img)
-    arr = np.asarray(img)
+    arr = as_rgb_array(img)
     h, w, c = arr.shape
 
     # 最大シフト幅（ピクセル）
     # strength=0.0 → 1px, 1.0 → 12px くらい
     max_shift = int(1 + 11 * strength)
     if max_shift <= 0:
-        return img
+        return ensure_rgb(img)
 
     out = np.empty_like(arr)
 
@@ -95,13 +174,12 @@ def apply_line_jitter(img: Image.Image, strength: float) -> Image.Image:
 # 3. 色量子化（階調を削る）
 # ============================
 
-def quantize_colors(img: Image.Image, levels: int) -> Image.Image:
+def quantize_colors(img: ImageLike, levels: int) -> Image.Image:
     """
     RGB 各チャンネルを 'levels' 段階に量子化する。
     levels を小さくするとグラデーションが大きく崩れる。
     """
-    img = ensure_rgb(img)
-    arr = np.asarray(img).astype(np.float32)
+    arr = as_rgb_array(img).astype(np.float32)
 
     levels = max(2, int(levels))
     step = 255.0 / float(levels - 1)
@@ -122,7 +200,7 @@ class ComboParams:
     mix: float       # 0〜1
 
 
-def apply_combo(img: Image.Image, strength: float, mix: float) -> Image.Image:
+def apply_combo(img: ImageLike, strength: float, mix: float) -> Image.Image:
     """
     - まず色階調を削る（量子化）
     - 高周波ノイズを付加
@@ -132,14 +210,12 @@ def apply_combo(img: Image.Image, strength: float, mix: float) -> Image.Image:
     strength = float(np.clip(strength, 0.0, 1.0))
     mix = float(np.clip(mix, 0.0, 1.0))
 
-    base = ensure_rgb(img)
-
     # 1) 色量子化：strength が強いほど levels を小さくする
     #    strength=0 → levels=64, 1 → levels=8
     max_levels = 64
     min_levels = 8
     levels = int(max_levels - (max_levels - min_levels) * strength)
-    quant = quantize_colors(base, levels=levels)
+    quant = quantize_colors(img, levels=levels)
 
     # 2) 高周波ノイズ（量子化後の画像に適用）
     hi = apply_highfreq(quant, strength=strength)
@@ -164,7 +240,7 @@ def apply_combo(img: Image.Image, strength: float, mix: float) -> Image.Image:
 Mode = Literal["highfreq", "jitter", "combo"]
 
 
-def apply_protect_filter(img: Image.Image, mode: Mode, strength: float, mix: float) -> Image.Image:
+def apply_protect_filter(img: ImageLike, mode: Mode, strength: float, mix: float) -> Image.Image:
     """
     GUI / CLI から呼び出す統一インターフェース。
     """
@@ -209,14 +285,15 @@ class ProtectConfig:
 
 
 def protect_image(
-    img: Image.Image,
+    img: ImageLike,
     config: ProtectConfig | None = None,
     *,
     mode: str | None = None,
     strength: float | None = None,
     mix: float | None = None,
+    out: np.ndarray | None = None,
     **kwargs,
-) -> Image.Image:
+) -> ImageLike:
     """
     旧バージョンとの互換用ラッパー。
 
@@ -226,6 +303,9 @@ def protect_image(
 
     みたいな呼び出しを全部受けられるようにして、
     最終的には apply_protect_filter に集約する。
+
+    img には ndarray / memmap も渡せる。out（open_raw_output の戻り値など）を
+    指定すると結果をその配列へコピーして書き込み、out を返す。
     """
 
     # 1) config が渡されていれば、そこを優先
@@ -239,9 +319,59 @@ def protect_image(
         strength_val = strength if strength is not None else 0.9
         mix_val = mix if mix is not None else 0.9
 
-    return apply_protect_filter(
+    result = apply_protect_filter(
         img=img,
         mode=mode_val,
         strength=strength_val,
         mix=mix_val,
-    )
\ No newline at end of file
+    )
+    if out is None:
+        return result
+
+    out[...] = as_rgb_array(result)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+# ============================
+# 7. 生配列 I/O（.npy / ヘッダなし RGB）
+# ============================
+
+RAW_SUFFIXES = (".npy", ".rgb", ".raw")
+
+
+def is_raw_path(path: str | Path) -> bool:
+    """.npy / .rgb / .raw なら True（PNG 等のコーデックを通さない経路）"""
+    return Path(path).suffix.lower() in RAW_SUFFIXES
+
+
+def load_raw(path: str | Path, size: tuple[int, int] | None = None) -> np.ndarray:
+    """
+    .npy は np.load(mmap_mode="r")、ヘッダなし RGB は np.memmap で読み取り専用マップする。
+    ヘッダなしの場合は size=(幅, 高さ) が必須。
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".npy":
+        return as_rgb_array(np.load(path, mmap_mode="r"))
+
+    if size is None:
+        raise ValueError(f"ヘッダなし RGB にはサイズ（幅x高さ）の指定が必要です: {path}")
+    w, h = size
+    expected = w * h * 3
+    actual = path.stat().st_size
+    if actual != expected:
+        raise ValueError(f"ファイルサイズが {w}x{h} RGB と一致しません: {actual} != {expected} bytes")
+    return np.memmap(path, dtype=np.uint8, mode="r", shape=(h, w, 3))
+
+
+def open_raw_output(path: str | Path, shape: tuple[int, ...]) -> np.memmap:
+    """
+    出力先を (H, W, 3) uint8 で書き込み用にマップする。
+    .npy はヘッダ付き、それ以外はヘッダなし RGB として作成する。
+    """
+    path = Path(path)
+    shape = (int(shape[0]), int(shape[1]), 3)
+    if path.suffix.lower() == ".npy":
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+    return np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
\ No newline at end of file
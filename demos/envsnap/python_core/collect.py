@@ -2,35 +2,95 @@
 from __future__ import annotations
 
 import argparse
+import json
 import locale as pylocale
 import os
 import platform
 import re
+import shlex
 import socket
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # --- 重要：実行場所に依存せず同ディレクトリの format.py を読めるようにする ---
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 if _THIS_DIR not in sys.path:
     sys.path.insert(0, _THIS_DIR)
 
-from format import to_json, to_text  # noqa: E402
+import probe_cache  # noqa: E402
+from format import timings_to_text, to_json, to_text  # noqa: E402
 
+# 1 つのプローブ（外部コマンド 1 回分など）。取得できたフィールドを dict で返す。
+Probe = Callable[[], Dict[str, Any]]
 
-def _run(cmd: List[str], timeout: int = 6) -> str:
+# collect() 全体の締め切り（秒）。超えたプローブの結果は None のまま返す。
+DEFAULT_TIMEOUT = 10.0
+
+# プローブ実行中のスレッドに全体の締め切り（time.monotonic() 基準）と、
+# _run で起きた失敗（"timeout" / "error"）を持たせる
+_probe_ctx = threading.local()
+
+
+def _note_failure(outcome: str) -> None:
+    # 1 つのプローブ内で複数回 _run しても、timeout を優先して残す
+    if getattr(_probe_ctx, "outcome", None) != "timeout":
+        _probe_ctx.outcome = outcome
+
+
+def _run(cmd: List[str], timeout: float = 6) -> str:
+    deadline = getattr(_probe_ctx, "deadline", None)
+    if deadline is not None:
+        # 全体の締め切りを超えて子プロセスを待たない（超えたら kill される）
+        timeout = max(0.0, min(timeout, deadline - time.monotonic()))
     try:
         out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, timeout=timeout)
         return out.decode(errors="replace").strip()
+    except subprocess.TimeoutExpired:
+        _note_failure("timeout")
+        return ""
     except Exception:
+        _note_failure("error")
         return ""
 
 
-def _run_ps(ps_command: str, timeout: int = 8) -> str:
+def split_command(value: str) -> List[str]:
+    """
+    コマンド文字列を argv に分ける。Windows では cmd.exe と同じく "..." で囲んだ部分を 1 つにし、
+    囲みの " は外す（shlex の非 POSIX モードは " を残すため）。
+    """
+    if os.name != "nt":
+        return shlex.split(value)
+    return [
+        part[1:-1] if len(part) >= 2 and part[0] == part[-1] == '"' else part
+        for part in shlex.split(value, posix=False)
+    ]
+
+
+def join_command(argv: List[str]) -> str:
+    """split_command で元の argv に戻るコマンド文字列を作る"""
+    return subprocess.list2cmdline(argv) if os.name == "nt" else shlex.join(argv)
+
+
+def _tool_cmd(name: str) -> List[str]:
+    """
+    外部コマンドの起動コマンド。環境変数 ENVSNAP_<NAME>（例: ENVSNAP_POWERSHELL, ENVSNAP_SYSCTL,
+    ENVSNAP_SYSTEM_PROFILER）で差し替えられる
+    （例: 'python tools/fake_probe.py powershell' … スタンドインでの動作確認・ベンチマーク用）。
+    """
+    override = os.environ.get(f"ENVSNAP_{name.upper()}", "").strip()
+    if override:
+        return split_command(override)
+    return [name]
+
+
+def _run_ps(ps_command: str, timeout: float = 8) -> str:
     # Windows PowerShell
-    return _run(["powershell", "-NoProfile", "-Command", ps_command], timeout=timeout)
+    return _run([*_tool_cmd("powershell"), "-NoProfile", "-Command", ps_command], timeout=timeout)
 
 
 def _guess_timezone() -> str:
@@ -64,67 +124,331 @@ def _safe_locale_tag() -> Optional[str]:
     return None
 
 
-def _collect_windows() -> Dict[str, Any]:
-    cpu = _norm_space(_run_ps("(Get-CimInstance Win32_Processor | Select-Object -First 1 -ExpandProperty Name)"))
-    model = _norm_space(_run_ps("(Get-CimInstance Win32_ComputerSystem | Select-Object -First 1 -ExpandProperty Model)"))
-
-    mem_bytes_s = _norm_space(
-        _run_ps("(Get-CimInstance Win32_ComputerSystem | Select-Object -First 1 -ExpandProperty TotalPhysicalMemory)")
-    )
-    memory_gb: Optional[float] = None
+def _parse_memory_gb(mem_bytes_s: str) -> Optional[float]:
     try:
-        mem_bytes = int(mem_bytes_s)
-        memory_gb = round(mem_bytes / (1024 ** 3), 2)
+        return round(int(mem_bytes_s) / (1024 ** 3), 2)
     except Exception:
-        memory_gb = None
+        return None
+
 
-    gpus_raw = _run_ps("(Get-CimInstance Win32_VideoController | Select-Object -ExpandProperty Name)")
+# Win32_Processor / Win32_ComputerSystem / Win32_VideoController を 1 回の PowerShell 起動でまとめて取得し、
+# 1 つの JSON として出力させる（起動コストが 1 回約 1 秒かかるため）。
+_WINDOWS_CIM_PS = (
+    "[Console]::OutputEncoding = [Text.Encoding]::UTF8; "
+    "$p = Get-CimInstance Win32_Processor | Select-Object -First 1; "
+    "$cs = Get-CimInstance Win32_ComputerSystem | Select-Object -First 1; "
+    "$vc = @(Get-CimInstance Win32_VideoController | ForEach-Object { [string]$_.Name }); "
+    "[pscustomobject]@{ cpu = [string]$p.Name; device_model = [string]$cs.Model; "
+    "memory_bytes = $cs.TotalPhysicalMemory; gpus = $vc } | ConvertTo-Json -Compress"
+)
+
+
+def _parse_windows_cim(raw: str) -> Dict[str, Any]:
+    """_WINDOWS_CIM_PS の出力（JSON）を report のフィールドに変換する"""
+    # stderr も混ざるので、JSON オブジェクト部分だけを取り出す
+    start, end = raw.find("{"), raw.rfind("}")
+    try:
+        doc = json.loads(raw[start : end + 1]) if start != -1 and end > start else {}
+    except ValueError:
+        doc = {}
+    if not isinstance(doc, dict):
+        doc = {}
+
+    gpus_raw = doc.get("gpus")
+    if isinstance(gpus_raw, str):
+        gpus_raw = [gpus_raw]
     gpus: List[str] = []
-    if gpus_raw:
-        for line in gpus_raw.splitlines():
-            line = _norm_space(line)
-            if line and line.lower() != "name":
-                gpus.append(line)
+    for name in gpus_raw or []:
+        name = _norm_space(str(name or ""))
+        if name:
+            gpus.append(name)
 
     return {
-        "cpu": cpu or None,
-        "device_model": model or None,
-        "memory_gb": memory_gb,
+        "cpu": _norm_space(str(doc.get("cpu") or "")) or None,
+        "device_model": _norm_space(str(doc.get("device_model") or "")) or None,
+        "memory_gb": _parse_memory_gb(str(doc.get("memory_bytes") or "")),
         "gpus": gpus or None,
     }
 
 
-def _collect_macos() -> Dict[str, Any]:
-    model = _norm_space(_run(["sysctl", "-n", "hw.model"]))
-    mem_bytes_s = _norm_space(_run(["sysctl", "-n", "hw.memsize"]))
-    memory_gb: Optional[float] = None
-    try:
-        memory_gb = round(int(mem_bytes_s) / (1024 ** 3), 2)
-    except Exception:
-        memory_gb = None
+def _probe_win_cim() -> Dict[str, Any]:
+    return _parse_windows_cim(_run_ps(_WINDOWS_CIM_PS, timeout=10))
+
+
+def _probe_mac_model() -> Dict[str, Any]:
+    model = _norm_space(_run([*_tool_cmd("sysctl"), "-n", "hw.model"]))
+    return {"device_model": model or None}
+
+
+def _probe_mac_memory() -> Dict[str, Any]:
+    mem_bytes_s = _norm_space(_run([*_tool_cmd("sysctl"), "-n", "hw.memsize"]))
+    return {"memory_gb": _parse_memory_gb(mem_bytes_s)}
 
-    cpu = _norm_space(_run(["sysctl", "-n", "machdep.cpu.brand_string"]))
+
+def _probe_mac_cpu() -> Dict[str, Any]:
+    cpu = _norm_space(_run([*_tool_cmd("sysctl"), "-n", "machdep.cpu.brand_string"]))
     if not cpu:
         cpu = "Apple Silicon" if platform.machine().lower() in ("arm64", "aarch64") else ""
+    return {"cpu": cpu or None}
+
 
-    sp = _run(["system_profiler", "SPDisplaysDataType"])
+def _probe_mac_gpus() -> Dict[str, Any]:
+    sp = _run([*_tool_cmd("system_profiler"), "SPDisplaysDataType"])
     gpus: List[str] = []
     if sp:
         for m in re.finditer(r"Chipset Model:\s*(.+)", sp):
             name = _norm_space(m.group(1))
             if name:
                 gpus.append(name)
+    return {"gpus": gpus or None}
+
+
+# --- Linux: /proc と /sys を直接読む（外部コマンドは起動しない） ---
+
+# DMI の product_name に入りがちなダミー値
+_DMI_PLACEHOLDERS = {
+    "",
+    "to be filled by o.e.m.",
+    "system product name",
+    "default string",
+    "not applicable",
+    "none",
+}
+
+# PCI ベンダー ID → 表示名（GPU 名の前置き用）
+_PCI_VENDORS = {
+    "0x10de": "NVIDIA",
+    "0x1002": "AMD",
+    "0x8086": "Intel",
+    "0x1a03": "ASPEED",
+    "0x102b": "Matrox",
+    "0x15ad": "VMware",
+    "0x1af4": "Red Hat (virtio)",
+    "0x1234": "QEMU",
+    "0x1414": "Microsoft",
+}
+
+
+def _read_file(path: str, limit: int = 1 << 20) -> str:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read(limit)
+    except OSError:
+        return ""
+
+
+def _linux_cpu(root: str) -> Optional[str]:
+    fallback = ""
+    for line in _read_file(os.path.join(root, "proc/cpuinfo")).splitlines():
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        key = key.strip().lower()
+        value = _norm_space(value)
+        if key == "model name" and value:
+            return value
+        # ARM 系は model name が無く、Model / Hardware に機種名が入ることがある
+        if key in ("model", "hardware") and value and not value.isdigit() and not fallback:
+            fallback = value
+    return fallback or None
+
+
+def _linux_memory_gb(root: str) -> Optional[float]:
+    for line in _read_file(os.path.join(root, "proc/meminfo")).splitlines():
+        if line.startswith("MemTotal:"):
+            m = re.search(r"(\d+)\s*kB", line)
+            if m:
+                return round(int(m.group(1)) * 1024 / (1024 ** 3), 2)
+    return None
+
+
+def _linux_device_model(root: str) -> Optional[str]:
+    name = _norm_space(_read_file(os.path.join(root, "sys/class/dmi/id/product_name")))
+    if name.lower() not in _DMI_PLACEHOLDERS:
+        return name
+    # DMI の無い ARM ボード等は device-tree の model を使う
+    name = _norm_space(_read_file(os.path.join(root, "proc/device-tree/model")).replace("\0", " "))
+    return name or None
 
+
+def _linux_gpus(root: str) -> Optional[List[str]]:
+    drm = os.path.join(root, "sys/class/drm")
+    try:
+        cards = sorted(n for n in os.listdir(drm) if re.fullmatch(r"card\d+", n))
+    except OSError:
+        return None
+
+    gpus: List[str] = []
+    seen = set()
+    for card in cards:
+        dev = os.path.join(drm, card, "device")
+        vendor = _norm_space(_read_file(os.path.join(dev, "vendor"))).lower()
+        if not vendor:
+            # PCI でないもの（simpledrm のようなファームウェアのフレームバッファ等）は対象外
+            continue
+        uevent: Dict[str, str] = {}
+        for line in _read_file(os.path.join(dev, "uevent")).splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                uevent[key.strip()] = value.strip()
+
+        # 同じ GPU の card が複数ある場合の重複除去。PCI のバス ID（uevent か、device リンクの先）で判定し、
+        # どちらも無ければ（root に置いた偽のツリーなど）card ごとに別の GPU とみなす
+        bus_id = uevent.get("PCI_SLOT_NAME") or (
+            os.path.basename(os.path.realpath(dev)) if os.path.islink(dev) else card
+        )
+        if bus_id in seen:
+            continue
+        seen.add(bus_id)
+
+        device = _norm_space(_read_file(os.path.join(dev, "device"))).lower()
+        driver = uevent.get("DRIVER", "")
+
+        # NVIDIA のプロプライエタリドライバは製品名を公開している
+        info = _read_file(os.path.join(root, "proc/driver/nvidia/gpus", bus_id, "information"))
+        m = re.search(r"^Model:\s*(.+)$", info, re.MULTILINE)
+        if m:
+            gpus.append(_norm_space(m.group(1)))
+            continue
+
+        name = _PCI_VENDORS.get(vendor, vendor)
+        ids = f"{vendor[2:]}:{device[2:]}" if device else vendor[2:]
+        label = f"{name} [{ids}]"
+        if driver:
+            label += f" ({driver})"
+        gpus.append(label)
+    return gpus or None
+
+
+def _collect_linux(root: str = "/") -> Dict[str, Any]:
+    """
+    /proc/cpuinfo・/proc/meminfo・/sys/class/dmi/id・/sys/class/drm を読むだけで集める。
+    root を変えると、その下の偽の proc/sys ツリーを読む（動作確認用）。
+    """
     return {
-        "cpu": cpu or None,
-        "device_model": model or None,
-        "memory_gb": memory_gb,
-        "gpus": gpus or None,
+        "cpu": _linux_cpu(root),
+        "device_model": _linux_device_model(root),
+        "memory_gb": _linux_memory_gb(root),
+        "gpus": _linux_gpus(root),
     }
 
 
-def collect() -> Dict[str, Any]:
-    os_name = platform.system()
+_WINDOWS_PROBES: Dict[str, Probe] = {
+    "cim": _probe_win_cim,
+}
+
+# プローブ名とフィールド名が一致しないもの（1 回で複数項目を返すプローブ）
+_PROBE_FIELDS: Dict[str, tuple] = {
+    "cim": ("cpu", "device_model", "memory_gb", "gpus"),
+}
+
+_MACOS_PROBES: Dict[str, Probe] = {
+    "device_model": _probe_mac_model,
+    "memory_gb": _probe_mac_memory,
+    "cpu": _probe_mac_cpu,
+    "gpus": _probe_mac_gpus,
+}
+
+
+def _timed_call(probe: Probe, deadline: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    プローブを実行し、(結果, {"ms": 所要時間, "outcome": ok / timeout / error / empty}) を返す。
+    """
+    _probe_ctx.deadline = deadline
+    _probe_ctx.outcome = None
+    started = time.perf_counter()
+    try:
+        fields = probe()
+    except Exception:
+        fields = {}
+        _note_failure("error")
+    ms = round((time.perf_counter() - started) * 1000, 1)
+
+    outcome = _probe_ctx.outcome
+    if outcome is None:
+        outcome = "ok" if any(v is not None for v in fields.values()) else "empty"
+    return fields, {"ms": ms, "outcome": outcome}
+
+
+def _run_probes(
+    probes: Dict[str, Probe],
+    timeout: float = DEFAULT_TIMEOUT,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    timings: Optional[Dict[str, Dict[str, Any]]] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    プローブを並行実行し、timeout 秒以内に返ってきた分だけをまとめて返す。
+    所要時間は各プローブの合計ではなく、最も遅いプローブ（または timeout）になる。
+    on_result を渡すと、プローブが 1 つ終わるたびにその結果で呼ばれる（呼び出し元のスレッドで）。
+    timings を渡すと、プローブ名ごとの所要時間と結果（ok / timeout / error / empty）を書き込む。
+    max_workers で同時実行数を絞れる（1 なら逐次実行。ベンチマークでの比較用）。
+    """
+    results: Dict[str, Any] = {}
+    if not probes:
+        return results
+
+    deadline = time.monotonic() + timeout
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(probes), thread_name_prefix="envsnap-probe")
+    futures = {pool.submit(_timed_call, probe, deadline): name for name, probe in probes.items()}
+    try:
+        for fut in as_completed(futures, timeout=timeout):
+            fields, timing = fut.result()
+            if timings is not None:
+                timings[futures[fut]] = timing
+            results.update(fields)
+            if on_result is not None:
+                on_result(fields)
+    except FuturesTimeout:
+        # 締め切りに間に合わなかったプローブは捨てて、部分結果を返す
+        if timings is not None:
+            for name in futures.values():
+                timings.setdefault(name, {"ms": round(timeout * 1000, 1), "outcome": "timeout"})
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def _collect_windows(timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+    return _run_probes(_WINDOWS_PROBES, timeout=timeout)
+
+
+def _collect_macos(timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+    return _run_probes(_MACOS_PROBES, timeout=timeout)
+
+
+def _pending_probes(probes: Dict[str, Probe], cached: Dict[str, Any]) -> Dict[str, Probe]:
+    """キャッシュで全項目が埋まるプローブを除いたもの"""
+    return {
+        name: probe
+        for name, probe in probes.items()
+        if not all(field in cached for field in _PROBE_FIELDS.get(name, (name,)))
+    }
+
+
+def collect(
+    timeout: float = DEFAULT_TIMEOUT,
+    use_cache: bool = True,
+    refresh: bool = False,
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+    timings: bool = False,
+    system: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    環境情報を収集する。
+    use_cache=True なら静的項目（CPU / 機種 / メモリ / GPU）を probe_cache から再利用し、
+    refresh=True ならキャッシュを読まずに取り直して保存し直す。
+    on_update を渡すと、途中経過の report（コピー）で都度呼ばれる
+    （軽い項目がそろった時点で 1 回、以降プローブが終わるたびに 1 回）。
+    timings=True なら report["timings"] にプローブごとの所要時間と結果を入れる
+    （結果は ok / timeout / error / empty / cached）。
+    system / max_workers はベンチマーク用（検出した OS の代わりに使う名前、プローブの同時実行数）。
+    """
+    started = time.perf_counter()
+    probe_timings: Dict[str, Dict[str, Any]] = {}
+    os_name = system or platform.system()
     base: Dict[str, Any] = {
         "timestamp": datetime.now(timezone.utc).astimezone().isoformat(timespec="seconds"),
         "os_name": os_name,
@@ -140,14 +464,46 @@ def collect() -> Dict[str, Any]:
     }
 
     if os_name.lower() == "windows":
-        base.update(_collect_windows())
+        probes = _WINDOWS_PROBES
     elif os_name.lower() == "darwin":
         base["os_name"] = "macOS"
         base["os_version"] = platform.mac_ver()[0] or base["os_version"]
-        base.update(_collect_macos())
+        probes = _MACOS_PROBES
     else:
-        base["cpu"] = platform.processor() or None
-
+        if os_name.lower() == "linux":
+            # ファイルを読むだけで数ミリ秒なので、キャッシュもスレッドも使わない
+            fields, probe_timings["linux"] = _timed_call(_collect_linux)
+            base.update(fields)
+        else:
+            # /proc や /sys が無い OS（FreeBSD 等）は従来どおり
+            base["cpu"] = platform.processor() or None
+        if timings:
+            base["timings"] = {"total_ms": round((time.perf_counter() - started) * 1000, 1), "probes": probe_timings}
+        if on_update is not None:
+            on_update(dict(base))
+        return base
+
+    cached = probe_cache.load(base["hostname"]) if use_cache and not refresh else {}
+    base.update(cached)
+    if on_update is not None:
+        on_update(dict(base))
+
+    def merge(fields: Dict[str, Any]) -> None:
+        base.update(fields)
+        if on_update is not None:
+            on_update(dict(base))
+
+    pending = _pending_probes(probes, cached)
+    for name in probes:
+        if name not in pending:
+            probe_timings[name] = {"ms": 0.0, "outcome": "cached"}
+
+    results = _run_probes(pending, timeout=timeout, on_result=merge, timings=probe_timings, max_workers=max_workers)
+    if use_cache:
+        probe_cache.store(base["hostname"], results)
+
+    if timings:
+        base["timings"] = {"total_ms": round((time.perf_counter() - started) * 1000, 1), "probes": probe_timings}
     return base
 
 
@@ -155,13 +511,40 @@ def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--format", choices=["json", "text"], default="text")
     parser.add_argument("--pretty", action="store_true", help="json整形")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="収集全体の締め切り（秒）。間に合わなかった項目は未取得になる",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを読み書きしない")
+    parser.add_argument("--refresh", action="store_true", help="キャッシュを無視して取り直し、保存し直す")
+    parser.add_argument("--history", metavar="DIR", help="結果をホストごとの履歴（差分記録）にも追記する")
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="プローブごとの所要時間と結果を出力に含める（json は timings キー、text は末尾に一覧）",
+    )
     args = parser.parse_args()
 
-    report = collect()
+    report = collect(
+        timeout=args.timeout,
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
+        timings=args.timings,
+    )
+    if args.history:
+        from history import append as append_history
+
+        # timings は実行ごとに変わるので履歴には残さない
+        append_history({k: v for k, v in report.items() if k != "timings"}, args.history)
     if args.format == "json":
         print(to_json(report, pretty=bool(args.pretty)), end="")
     else:
         print(to_text(report), end="")
+        if args.timings:
+            print()
+            print(timings_to_text(report["timings"]), end="")
     return 0
 
 
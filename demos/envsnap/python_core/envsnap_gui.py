@@ -2,7 +2,9 @@
 from __future__ import annotations
 
 import os
+import queue
 import sys
+import threading
 import traceback
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
@@ -15,6 +17,9 @@ if _THIS_DIR not in sys.path:
 from collect import collect  # noqa: E402
 from format import to_json, to_text  # noqa: E402
 
+# 収集スレッドからの結果を拾いに行く間隔（ミリ秒）
+_POLL_MS = 50
+
 
 class App(tk.Tk):
     def __init__(self) -> None:
@@ -23,11 +28,16 @@ class App(tk.Tk):
         self.minsize(820, 560)
 
         self.report = {}
+        # 収集はワーカースレッドで行い、結果はキュー経由で after() のポーリングから画面に反映する
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._collecting = False
+        self._refresh_pending = False
+
         self._build_ui()
         self._bind_keys()
 
-        # 起動直後に取得
-        self.on_refresh()
+        # 起動直後に取得（ウィンドウを先に描画してから）
+        self.after_idle(self.on_refresh)
 
     def _build_ui(self) -> None:
         # ルート
@@ -100,23 +110,59 @@ class App(tk.Tk):
         self._status.configure(text=msg)
 
     def on_refresh(self) -> None:
-        try:
-            self._set_status("Collecting environment info...")
-            self.update_idletasks()
+        # 収集中の Refresh は積み上げず、終わった後に 1 回だけ取り直す
+        if self._collecting:
+            self._refresh_pending = True
+            self._set_status("Collecting environment info... (refresh queued)")
+            return
 
-            self.report = collect()
-            content = to_text(self.report)
+        self._collecting = True
+        self._set_status("Collecting environment info...")
+        threading.Thread(target=self._collect_worker, name="envsnap-collect", daemon=True).start()
+        self.after(_POLL_MS, self._poll_results)
 
-            self._set_text(content)
-            self._set_status("Updated.")
+    def _collect_worker(self) -> None:
+        # ワーカースレッド側：Tk には触らず、キューに積むだけ
+        try:
+            report = collect(on_update=lambda partial: self._results.put(("partial", partial)))
+            self._results.put(("done", report))
         except Exception as e:
-            self._set_status("Failed.")
-            detail = traceback.format_exc()
-            messagebox.showerror(
-                "EnvSnap",
-                "Failed to collect environment info.\n\n"
-                f"{e}\n\n--- details ---\n{detail}",
-            )
+            self._results.put(("error", (e, traceback.format_exc())))
+
+    def _poll_results(self) -> None:
+        finished = False
+        try:
+            while not finished:
+                kind, payload = self._results.get_nowait()
+                if kind == "partial":
+                    # 取れた項目から順に表示していく
+                    self.report = payload
+                    self._set_text(to_text(payload))
+                elif kind == "done":
+                    self.report = payload
+                    self._set_text(to_text(payload))
+                    self._set_status("Updated.")
+                    finished = True
+                else:
+                    e, detail = payload
+                    self._set_status("Failed.")
+                    messagebox.showerror(
+                        "EnvSnap",
+                        "Failed to collect environment info.\n\n"
+                        f"{e}\n\n--- details ---\n{detail}",
+                    )
+                    finished = True
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.after(_POLL_MS, self._poll_results)
+            return
+
+        self._collecting = False
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self.on_refresh()
 
     def on_copy(self) -> None:
         content = self._get_text()
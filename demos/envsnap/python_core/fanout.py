@@ -0,0 +1,189 @@
+# envsnap/python_core/fanout.py
+#
+# 複数ホストで collect.py --format json を同時に実行し、終わったホストから順に NDJSON で出力する。
+# 遅いホストがあっても他のホストの結果は待たされない。
+#
+#   python fanout.py --transport ssh host1 host2 host3
+#   python fanout.py --transport ssh --hosts-file lab.txt --concurrency 16 --timeout 30
+#   python fanout.py --transport local a b c          # 手元で collect.py を実行（動作確認用）
+#
+# 出力（1 行 1 ホスト）:
+#   {"host": "host1", "ok": true, "report": {...}, "elapsed_s": 1.23}
+#   {"host": "host2", "ok": false, "error": "timeout", "elapsed_s": 30.0}
+#
+# トランスポートは Transport のサブクラスで、「ホスト名 → collect.py の JSON 出力（bytes）」を返す async の run() を実装する。
+# TRANSPORTS の名前、または "module:Class" で差し替えられる。
+from __future__ import annotations
+
+import abc
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+# --- 重要：実行場所に依存せず同ディレクトリの collect.py を読めるようにする ---
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+
+from collect import join_command, split_command  # noqa: E402
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 60.0
+
+
+class TransportError(RuntimeError):
+    pass
+
+
+class Transport(abc.ABC):
+    """ホストで collect を実行し、JSON の出力（bytes）を返す。run() を実装していないと生成時に TypeError"""
+
+    @abc.abstractmethod
+    async def run(self, host: str, timeout: float) -> bytes:
+        ...
+
+
+class CommandTransport(Transport):
+    """
+    コマンドテンプレートをサブプロセスとして実行する。テンプレート中の {host} はホスト名に置き換わる。
+    タイムアウトしたら子プロセスを kill する。
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+
+    def argv(self, host: str) -> List[str]:
+        return [part.replace("{host}", host) for part in split_command(self.template)]
+
+    async def run(self, host: str, timeout: float) -> bytes:
+        proc = await asyncio.create_subprocess_exec(
+            *self.argv(host),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except BaseException:
+            # タイムアウト・キャンセル（fan_out 側の締め切りを含む）で子プロセスを残さない
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        if proc.returncode != 0:
+            detail = err.decode(errors="replace").strip().splitlines()
+            raise TransportError(f"exit {proc.returncode}" + (f": {detail[-1]}" if detail else ""))
+        return out
+
+
+def _local_template() -> str:
+    collect_py = os.path.join(_THIS_DIR, "collect.py")
+    return join_command([sys.executable, collect_py, "--format", "json"])
+
+
+# 名前 → トランスポートを作る関数（引数は --command のテンプレート。None なら既定）
+TRANSPORTS: Dict[str, Callable[[Optional[str]], Transport]] = {
+    # 手元で collect.py を実行する（ホスト名はラベルとしてだけ使う）
+    "local": lambda command: CommandTransport(command or _local_template()),
+    # ssh 先で collect.py を実行する（リモート側に envsnap を配置しておく前提）
+    "ssh": lambda command: CommandTransport(
+        command or "ssh -o BatchMode=yes {host} python3 envsnap/python_core/collect.py --format json"
+    ),
+}
+
+
+def make_transport(name: str, command: Optional[str] = None) -> Transport:
+    factory = TRANSPORTS.get(name)
+    if factory is not None:
+        return factory(command)
+    if ":" in name:
+        module_name, _, attr = name.partition(":")
+        cls = getattr(importlib.import_module(module_name), attr)
+        return cls(command) if command else cls()
+    raise ValueError(f"unknown transport: {name}（{', '.join(TRANSPORTS)} または module:Class）")
+
+
+async def fan_out(
+    hosts: List[str],
+    transport: Transport,
+    emit: Callable[[Dict[str, Any]], None],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> int:
+    """
+    hosts を同時に最大 concurrency 件ずつ実行し、終わった順に emit(結果) を呼ぶ。
+    失敗したホスト数を返す。
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+    failures = 0
+
+    async def one(host: str) -> None:
+        nonlocal failures
+        async with sem:
+            started = loop.time()
+            rec: Dict[str, Any] = {"host": host}
+            try:
+                # トランスポートが timeout を守らなくても、ここで打ち切る
+                out = await asyncio.wait_for(transport.run(host, timeout), timeout)
+                report = json.loads(out.decode("utf-8"))
+                rec.update(ok=True, report=report)
+            except asyncio.TimeoutError:
+                rec.update(ok=False, error="timeout")
+            except (ValueError, UnicodeDecodeError) as e:
+                rec.update(ok=False, error=f"invalid json: {e}")
+            except Exception as e:
+                rec.update(ok=False, error=str(e) or type(e).__name__)
+            rec["elapsed_s"] = round(loop.time() - started, 3)
+        if not rec["ok"]:
+            failures += 1
+        emit(rec)
+
+    await asyncio.gather(*(one(h) for h in hosts))
+    return failures
+
+
+def _read_hosts(path: str) -> List[str]:
+    hosts: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                hosts.append(line)
+    return hosts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="複数ホストで envsnap を同時に収集し、NDJSON で出力する")
+    parser.add_argument("hosts", nargs="*", help="ホスト名")
+    parser.add_argument("--hosts-file", help="ホスト名の一覧（1 行 1 ホスト、# 以降はコメント）")
+    parser.add_argument("--transport", default="ssh", help=f"{' / '.join(TRANSPORTS)} または module:Class")
+    parser.add_argument("--command", help="トランスポートのコマンドテンプレート（{host} を置換）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時実行数の上限")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="ホストごとのタイムアウト（秒）")
+    args = parser.parse_args()
+
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        hosts.extend(_read_hosts(args.hosts_file))
+    if not hosts:
+        parser.error("ホストを 1 つ以上指定してください")
+
+    try:
+        transport = make_transport(args.transport, args.command)
+    except (ValueError, ImportError, AttributeError, TypeError) as e:
+        parser.error(str(e))
+
+    def emit(rec: Dict[str, Any]) -> None:
+        sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    failures = asyncio.run(fan_out(hosts, transport, emit, concurrency=args.concurrency, timeout=args.timeout))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,499 @@
+# envsnap/python_core/fleet.py
+#
+# 多数のマシンから集めた to_json レポート（*.json）を、列ごとのファイルに詰めたインデックスにまとめ、
+# 「memory_gb < 8 かつ GPU に RTX を含む」のような条件で素早く絞り込むためのツール。
+#
+#   python fleet.py ingest reports/ --index fleet.idx
+#   python fleet.py query --index fleet.idx "memory_gb<8" "gpu~RTX"
+#
+# インデックスの中身（すべて追記 or 固定長の上書きで更新する）:
+#   meta.json        … 行数など
+#   files.json       … 取り込み済みファイル → 行番号 / mtime / サイズ / sha1（再取り込みの判定用）
+#                      src から消えたファイルは取り除き、その行の path を「未取得」にして検索対象から外す
+#   <列>.col         … 固定長の列（文字列列は下のファイル内の位置、数値列は float）
+#   <列>.dict        … 文字列列の辞書（「長さ + UTF-8」を並べたもの、追記のみ。同じ文字列は 1 回だけ書く）
+#   <列>.str         … host / path の文字列（形式は .dict と同じだが重複を除かない）
+# 文字列列の値はファイル内の位置なので、表示する行の分だけを読めばよい。位置 0 は「未取得」。
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import operator
+import os
+import re
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+INDEX_VERSION = 2
+
+# 文字列列
+STRING_COLUMNS = ("host", "os_name", "os_version", "arch", "device_model", "cpu", "gpu", "path")
+# そのうち行ごとにほぼ値が異なる列（辞書にしても縮まないので、重複を除かずに並べる）
+UNIQUE_COLUMNS = ("host", "path")
+# 数値列（'f' = float32, 'd' = float64。未取得は NaN）
+NUMBER_COLUMNS = {"memory_gb": "f", "timestamp": "d"}
+
+_ID_TYPE = "I"  # 辞書列: .dict 内の位置（uint32）
+_OFFSET_TYPE = "Q"  # UNIQUE_COLUMNS: .str 内の位置（uint64）
+_MISSING_ID = 0
+_LEN = struct.Struct("<I")
+
+_CLAUSE_RE = re.compile(r"^\s*([a-z_]+)\s*(<=|>=|!=|<|>|=|~)\s*(.*?)\s*$")
+
+
+# ============================
+# 列ファイル
+# ============================
+
+def _heap_end(buf: Any) -> int:
+    """途中で切れていない最後のエントリの終わりの位置"""
+    pos, end = 0, len(buf)
+    while pos + _LEN.size <= end:
+        stop = pos + _LEN.size + _LEN.unpack_from(buf, pos)[0]
+        if stop > end:
+            break
+        pos = stop
+    return pos
+
+
+def _iter_heap(buf: Any) -> Iterator[Tuple[int, int, str]]:
+    """(開始位置, 終了位置, 文字列) を先頭から順に返す。途中で切れたエントリ以降は読まない。"""
+    pos, end = 0, len(buf)
+    while pos + _LEN.size <= end:
+        (n,) = _LEN.unpack_from(buf, pos)
+        stop = pos + _LEN.size + n
+        if stop > end:
+            break
+        yield pos, stop, bytes(buf[pos + _LEN.size : stop]).decode("utf-8")
+        pos = stop
+
+
+class _StringHeap:
+    """
+    文字列ファイルへの追記。書いた位置をそのまま ID として返す。
+    dedupe=True（辞書列）なら同じ文字列には同じ位置を返す。
+    """
+
+    def __init__(self, path: str, dedupe: bool) -> None:
+        self.path = path
+        self.ids: Optional[Dict[str, int]] = {} if dedupe else None
+        self._pending = bytearray()
+        self._base = 0  # 有効なデータの末尾
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if self.ids is not None:
+                for pos, stop, value in _iter_heap(data):
+                    self.ids[value] = pos
+                    self._base = stop
+            else:
+                self._base = _heap_end(data)
+        except FileNotFoundError:
+            pass
+        if self._base == 0:
+            self._pending += _LEN.pack(0)  # 位置 0 = 未取得
+
+    def id_for(self, value: Optional[str]) -> int:
+        if value is None or value == "":
+            return _MISSING_ID
+        if self.ids is not None:
+            found = self.ids.get(value)
+            if found is not None:
+                return found
+        pos = self._base + len(self._pending)
+        data = value.encode("utf-8")
+        self._pending += _LEN.pack(len(data)) + data
+        if self.ids is not None:
+            self.ids[value] = pos
+        return pos
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        with open(self.path, "ab") as f:
+            f.truncate(self._base)  # 前回の取り込みが途中で落ちて切れたエントリを捨てる
+            f.write(self._pending)
+        self._base += len(self._pending)
+        self._pending.clear()
+
+
+class _HeapReader:
+    """文字列ファイルをマップし、位置 → 文字列を引く（引いた位置のページだけが読まれる）"""
+
+    def __init__(self, path: str) -> None:
+        self._mm: Optional[mmap.mmap] = None
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "_HeapReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._mm is not None:
+            self._mm.close()
+
+    def get(self, pos: int) -> Optional[str]:
+        if pos == _MISSING_ID or self._mm is None:
+            return None
+        (n,) = _LEN.unpack_from(self._mm, pos)
+        start = pos + _LEN.size
+        return self._mm[start : start + n].decode("utf-8") or None
+
+    def matching_ids(self, pred: Callable[[str], bool]) -> set:
+        if self._mm is None:
+            return set()
+        return {pos for pos, _stop, value in _iter_heap(self._mm) if pos != _MISSING_ID and pred(value)}
+
+
+def _heap_path(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, f"{name}.str" if name in UNIQUE_COLUMNS else f"{name}.dict")
+
+
+def _col_path(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, f"{name}.col")
+
+
+def _typecode(name: str) -> str:
+    if name in NUMBER_COLUMNS:
+        return NUMBER_COLUMNS[name]
+    return _OFFSET_TYPE if name in UNIQUE_COLUMNS else _ID_TYPE
+
+
+def _read_column(index_dir: str, name: str, rows: int) -> array:
+    col = array(_typecode(name))
+    try:
+        with open(_col_path(index_dir, name), "rb") as f:
+            col.fromfile(f, rows)
+    except FileNotFoundError:
+        pass
+    return col
+
+
+def _overwrite_cells(index_dir: str, name: str, cells: List[Tuple[int, Any]]) -> None:
+    """(行番号, 値) の組を固定長のまま上書きする（ファイルは 1 回だけ開く）"""
+    code = _typecode(name)
+    itemsize = array(code).itemsize
+    with open(_col_path(index_dir, name), "r+b") as f:
+        for row, value in sorted(cells):
+            f.seek(row * itemsize)
+            array(code, [value]).tofile(f)
+
+
+def _append_column(index_dir: str, name: str, values: array, rows: int) -> None:
+    """rows 行目の直後から追記する（前回の取り込みが途中で落ちて残った分は切り捨てる）"""
+    with open(_col_path(index_dir, name), "ab") as f:
+        f.truncate(rows * values.itemsize)
+        values.tofile(f)
+
+
+def _load_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(path: str, doc: Any) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        json.dump(doc, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _meta(index_dir: str) -> Dict[str, Any]:
+    meta = _load_json(os.path.join(index_dir, "meta.json"), {})
+    if meta and meta.get("version") != INDEX_VERSION:
+        raise SystemExit(f"unsupported index version: {meta.get('version')}（インデックスを作り直してください）")
+    return meta or {"version": INDEX_VERSION, "rows": 0}
+
+
+# ============================
+# 取り込み
+# ============================
+
+def _iter_reports(src: str) -> Iterator[str]:
+    for dirpath, _dirnames, filenames in os.walk(src):
+        for name in sorted(filenames):
+            if name.lower().endswith(".json"):
+                yield os.path.join(dirpath, name)
+
+
+def _parse_timestamp(value: Any) -> float:
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _row_values(report: Dict[str, Any], rel_path: str) -> Dict[str, Any]:
+    gpus = report.get("gpus")
+    if isinstance(gpus, list):
+        gpu = ", ".join(str(g) for g in gpus if g)
+    else:
+        gpu = str(gpus) if gpus else None
+
+    try:
+        memory_gb = float(report.get("memory_gb"))
+    except (TypeError, ValueError):
+        memory_gb = math.nan
+
+    values: Dict[str, Any] = {
+        name: (str(report[name]) if report.get(name) not in (None, "") else None)
+        for name in ("os_name", "os_version", "arch", "device_model", "cpu")
+    }
+    values.update(
+        host=str(report.get("hostname") or "") or None,
+        gpu=gpu or None,
+        path=rel_path,
+        memory_gb=memory_gb,
+        timestamp=_parse_timestamp(report.get("timestamp")),
+    )
+    return values
+
+
+def ingest(src: str, index_dir: str) -> Tuple[int, int, int, int]:
+    """
+    src 以下の *.json を 1 件ずつ読み、インデックスに追加する。
+    mtime とサイズが同じファイルは開かず、変わっていても sha1 が同じなら読み直さない。
+    前回あって今回 src に無いファイルの行は削除済みにする。
+    戻り値は (追加, 更新, スキップ, 削除) の件数。
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    meta = _meta(index_dir)
+    files_path = os.path.join(index_dir, "files.json")
+    files: Dict[str, Dict[str, Any]] = _load_json(files_path, {})
+    heaps = {name: _StringHeap(_heap_path(index_dir, name), dedupe=name not in UNIQUE_COLUMNS) for name in STRING_COLUMNS}
+
+    rows = int(meta["rows"])
+    new_cols = {name: array(_typecode(name)) for name in (*STRING_COLUMNS, *NUMBER_COLUMNS)}
+    # 既存行の上書きは文字列ファイルを書いた後でまとめて行う（列 → (行番号, 値)）
+    overwrites: Dict[str, List[Tuple[int, Any]]] = {name: [] for name in new_cols}
+    added = updated = skipped = 0
+    seen = set()
+
+    for path in _iter_reports(src):
+        rel = os.path.relpath(path, src).replace(os.sep, "/")
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        seen.add(rel)
+        entry = files.get(rel)
+        if entry and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+            skipped += 1
+            continue
+
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            continue
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry and entry.get("sha1") == digest:
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            skipped += 1
+            continue
+
+        try:
+            report = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            continue
+        if not isinstance(report, dict):
+            continue
+
+        values = _row_values(report, rel)
+        encoded = {
+            name: (heaps[name].id_for(values[name]) if name in heaps else values[name])
+            for name in new_cols
+        }
+
+        if entry:
+            for name, value in encoded.items():
+                overwrites[name].append((entry["row"], value))
+            row = entry["row"]
+            updated += 1
+        else:
+            for name, value in encoded.items():
+                new_cols[name].append(value)
+            row = rows + added
+            added += 1
+        files[rel] = {"row": row, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": digest}
+
+    # 消えたファイルの行は path を「未取得」にする（検索は path のある行だけを対象にする）
+    removed = [rel for rel in files if rel not in seen]
+    for rel in removed:
+        overwrites["path"].append((files.pop(rel)["row"], _MISSING_ID))
+
+    # 文字列 → 列 → files / メタの順に書く。列が参照する文字列は必ず先に書かれている。
+    # 途中で落ちても、追記分はメタの行数を超えるので読まれず、次回の追記時に切り捨てられる。
+    # 上書き分は files.json の sha1 が古いままなので次回やり直される。
+    for heap in heaps.values():
+        heap.flush()
+    for name, cells in overwrites.items():
+        if cells:
+            _overwrite_cells(index_dir, name, cells)
+    for name, values in new_cols.items():
+        if values:
+            _append_column(index_dir, name, values, rows)
+    meta["rows"] = rows + added
+    _save_json(files_path, files)
+    _save_json(os.path.join(index_dir, "meta.json"), meta)
+    return added, updated, skipped, len(removed)
+
+
+# ============================
+# 検索
+# ============================
+
+def _parse_clause(clause: str) -> Tuple[str, str, str]:
+    m = _CLAUSE_RE.match(clause)
+    if not m:
+        raise ValueError(f"条件の書式が不正です: {clause!r}（例: memory_gb<8, gpu~RTX）")
+    name, op, value = m.groups()
+    if name not in STRING_COLUMNS and name not in NUMBER_COLUMNS:
+        raise ValueError(f"不明な列です: {name}")
+    if name in NUMBER_COLUMNS and op == "~":
+        raise ValueError(f"数値列に ~ は使えません: {clause!r}")
+    return name, op, value
+
+
+_NUM_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _string_pred(op: str, value: str) -> Callable[[str], bool]:
+    needle = value.lower()
+    if op == "~":
+        return lambda s: needle in s.lower()
+    if op == "=":
+        return lambda s: s.lower() == needle
+    if op == "!=":
+        return lambda s: s.lower() != needle
+    return lambda s: _NUM_OPS[op](s, value)
+
+
+def query(index_dir: str, clauses: List[str]) -> List[int]:
+    """
+    条件（AND）に合う行番号を返す。
+    文字列条件は文字列ファイル側で先に位置の集合にしてから列を走査するので、レポート本体は読まない。
+    """
+    parsed = [_parse_clause(c) for c in clauses]
+    rows = int(_meta(index_dir)["rows"])
+    candidates: Optional[List[int]] = None
+
+    for name, op, value in parsed:
+        col = _read_column(index_dir, name, rows)
+        # (行番号, セルの値) の組。最初の条件は全行、以降は候補の行だけ
+        cells = enumerate(col) if candidates is None else ((i, col[i]) for i in candidates)
+
+        if name in NUMBER_COLUMNS:
+            target = _parse_timestamp(value) if name == "timestamp" else float(value)
+            # 列と同じ精度に丸めてから比べる（float32 の 15.86 と float の 15.86 は一致しない）
+            target = array(_typecode(name), [target])[0]
+            cmp = _NUM_OPS[op]
+            # v == v で未取得（NaN）を除く
+            candidates = [i for i, v in cells if cmp(v, target) and v == v]
+        else:
+            with _HeapReader(_heap_path(index_dir, name)) as heap:
+                ids = heap.matching_ids(_string_pred(op, value))
+            candidates = [i for i, v in cells if v in ids]
+
+        if not candidates:
+            return []
+
+    # 削除済み（path が未取得）の行を除く
+    path = _read_column(index_dir, "path", rows)
+    if candidates is None:
+        return [i for i, v in enumerate(path) if v != _MISSING_ID]
+    return [i for i in candidates if path[i] != _MISSING_ID]
+
+
+def fetch_rows(index_dir: str, row_ids: List[int], columns: List[str]) -> List[Dict[str, Any]]:
+    rows = int(_meta(index_dir)["rows"])
+    out: List[Dict[str, Any]] = [{} for _ in row_ids]
+    for name in columns:
+        col = _read_column(index_dir, name, rows)
+        if name in NUMBER_COLUMNS:
+            for rec, i in zip(out, row_ids):
+                rec[name] = None if math.isnan(col[i]) else round(col[i], 2)
+        else:
+            with _HeapReader(_heap_path(index_dir, name)) as heap:
+                if name in UNIQUE_COLUMNS:
+                    for rec, i in zip(out, row_ids):
+                        rec[name] = heap.get(col[i])
+                else:
+                    values = {pos: heap.get(pos) for pos in {col[i] for i in row_ids}}
+                    for rec, i in zip(out, row_ids):
+                        rec[name] = values[col[i]]
+    return out
+
+
+# ============================
+# CLI
+# ============================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="envsnap JSON レポートの集約・検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="ディレクトリ内の *.json をインデックスに取り込む")
+    p_ingest.add_argument("src", help="レポートのディレクトリ")
+    p_ingest.add_argument("--index", required=True, help="インデックスのディレクトリ")
+
+    p_query = sub.add_parser("query", help="条件に合うホストを表示する")
+    p_query.add_argument("where", nargs="*", help="条件（AND）。例: 'memory_gb<8' 'gpu~RTX' 'os_name=Windows'")
+    p_query.add_argument("--index", required=True, help="インデックスのディレクトリ")
+    p_query.add_argument("--columns", default="host,os_name,cpu,memory_gb,gpu,path", help="表示する列（カンマ区切り）")
+    p_query.add_argument("--count", action="store_true", help="件数だけ表示する")
+    p_query.add_argument("--limit", type=int, default=0, help="表示件数の上限（0 = 無制限）")
+    p_query.add_argument("--format", choices=["tsv", "json"], default="tsv")
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        added, updated, skipped, removed = ingest(args.src, args.index)
+        print(f"added={added} updated={updated} skipped={skipped} removed={removed}")
+        return 0
+
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in STRING_COLUMNS and c not in NUMBER_COLUMNS]
+    if unknown:
+        parser.error(f"不明な列です: {', '.join(unknown)}")
+    try:
+        hits = query(args.index, args.where)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.count:
+        print(len(hits))
+        return 0
+    if args.limit > 0:
+        hits = hits[: args.limit]
+
+    for rec in fetch_rows(args.index, hits, columns):
+        if args.format == "json":
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        else:
+            sys.stdout.write("\t".join("" if rec[c] is None else str(rec[c]) for c in columns) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
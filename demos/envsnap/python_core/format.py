@@ -47,6 +47,14 @@ def to_text(report: Dict[str, Any]) -> str:
     return "\n".join(lines) + "\n"
 
 
+def timings_to_text(timings: Dict[str, Any]) -> str:
+    """collect(timings=True) の report["timings"] をテキストにする"""
+    lines: List[str] = [f"Timings: {_fmt_optional(timings.get('total_ms'))} ms"]
+    for name, probe in sorted((timings.get("probes") or {}).items()):
+        lines.append(f"  {name:<14} {probe.get('ms', 0):>8} ms  {probe.get('outcome', '')}")
+    return "\n".join(lines) + "\n"
+
+
 def to_json(report: Dict[str, Any], pretty: bool = True) -> str:
     if pretty:
         return json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
@@ -0,0 +1,310 @@
+# envsnap/python_core/history.py
+#
+# ホストごとのスナップショット履歴。collect() の結果を毎回まるごと保存する代わりに、
+# 前回からの差分（変わった項目だけ）を 1 行 1 JSON で追記し、一定件数ごとに全項目のチェックポイントを挟む。
+#
+#   <dir>/<host>.jsonl      … {"t": 時刻, "full": {...}} または {"t": 時刻, "set": {...}, "unset": [...]}
+#   <dir>/<host>.head.json  … 最新の状態・チェックポイントの位置（ログから作り直せる）
+#
+# 何も変わっていないスナップショットはログに書かない（容量も差分表示のコストも変更回数に比例する）。
+#
+#   python history.py append --dir hist                 # collect() して追記
+#   python history.py show myhost --dir hist --at 2026-01-01T00:00:00+09:00
+#   python history.py changes myhost --dir hist --since 2026-01-01T00:00:00+09:00
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import math
+import os
+import re
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --- 重要：実行場所に依存せず同ディレクトリの collect.py / format.py を読めるようにする ---
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _THIS_DIR not in sys.path:
+    sys.path.insert(0, _THIS_DIR)
+
+from format import to_json, to_text  # noqa: E402
+
+# 何件の差分ごとに全項目のチェックポイントを書くか
+CHECKPOINT_EVERY = 50
+
+# 差分の対象外（毎回変わるので "t" として別に持つ）
+_TIME_FIELD = "timestamp"
+
+
+def _safe_name(host: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", host or "") or "unknown"
+
+
+def _paths(history_dir: str, host: str) -> Tuple[str, str]:
+    base = os.path.join(history_dir, _safe_name(host))
+    return base + ".jsonl", base + ".head.json"
+
+
+def _epoch(t: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(str(t)).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _parse_time(value: str) -> float:
+    """引数で受け取った時点（ISO 8601）を epoch 秒にする。解釈できなければ ValueError"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        raise ValueError(f"ISO 8601 の時刻として解釈できません: {value!r}") from None
+
+
+def _diff(prev: Dict[str, Any], cur: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    changed = {k: v for k, v in cur.items() if k not in prev or prev[k] != v}
+    removed = sorted(k for k in prev if k not in cur)
+    return changed, removed
+
+
+def _apply(state: Dict[str, Any], rec: Dict[str, Any]) -> Dict[str, Any]:
+    if "full" in rec:
+        return dict(rec["full"])
+    state = dict(state)
+    state.update(rec.get("set") or {})
+    for k in rec.get("unset") or []:
+        state.pop(k, None)
+    return state
+
+
+def _iter_log(log_path: str, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(行の先頭オフセット, レコード) を順に返す。壊れた行は飛ばす。"""
+    try:
+        f = open(log_path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        pos = offset
+        for line in f:
+            start, pos = pos, pos + len(line)
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(rec, dict):
+                yield start, rec
+
+
+def _rebuild_head(log_path: str) -> Dict[str, Any]:
+    """ログを頭から読んで head を作り直す（head が無い・ログと食い違う場合）"""
+    head: Dict[str, Any] = {"state": {}, "t": None, "since_checkpoint": 0, "checkpoints": [], "size": 0}
+    for offset, rec in _iter_log(log_path):
+        head["state"] = _apply(head["state"], rec)
+        head["t"] = rec.get("t")
+        if "full" in rec:
+            head["checkpoints"].append([_epoch(rec.get("t")), offset])
+            head["since_checkpoint"] = 0
+        else:
+            head["since_checkpoint"] += 1
+    try:
+        head["size"] = os.path.getsize(log_path)
+    except OSError:
+        pass
+    return head
+
+
+def _load_head(log_path: str, head_path: str) -> Dict[str, Any]:
+    try:
+        with open(head_path, "r", encoding="utf-8") as f:
+            head = json.load(f)
+        if head.get("size") == os.path.getsize(log_path):
+            return head
+    except (OSError, ValueError, AttributeError):
+        pass
+    return _rebuild_head(log_path)
+
+
+def _save_head(head_path: str, head: Dict[str, Any]) -> None:
+    tmp = head_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        json.dump(head, f, ensure_ascii=False)
+    os.replace(tmp, head_path)
+
+
+# ============================
+# 追記
+# ============================
+
+def append(report: Dict[str, Any], history_dir: str, checkpoint_every: int = CHECKPOINT_EVERY) -> Optional[Dict[str, Any]]:
+    """
+    report をホストの履歴に追記する。書いたレコードを返す（変化が無ければ何も書かず None）。
+    """
+    os.makedirs(history_dir, exist_ok=True)
+    log_path, head_path = _paths(history_dir, str(report.get("hostname") or ""))
+    head = _load_head(log_path, head_path)
+
+    t = report.get(_TIME_FIELD)
+    cur = {k: v for k, v in report.items() if k != _TIME_FIELD}
+    changed, removed = _diff(head["state"], cur)
+    if head["checkpoints"] and not changed and not removed:
+        return None
+
+    if not head["checkpoints"] or head["since_checkpoint"] + 1 >= checkpoint_every:
+        rec: Dict[str, Any] = {"t": t, "full": cur}
+    else:
+        rec = {"t": t, "set": changed}
+        if removed:
+            rec["unset"] = removed
+
+    line = (json.dumps(rec, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+    with open(log_path, "ab") as f:
+        offset = f.tell()
+        f.write(line)
+
+    if "full" in rec:
+        head["checkpoints"].append([_epoch(t), offset])
+        head["since_checkpoint"] = 0
+    else:
+        head["since_checkpoint"] += 1
+    head["state"] = cur
+    head["t"] = t
+    head["size"] = offset + len(line)
+    _save_head(head_path, head)
+    return rec
+
+
+# ============================
+# 参照
+# ============================
+
+def _checkpoint_offset(head: Dict[str, Any], at: float) -> int:
+    """at 以前で最後のチェックポイントの位置（無ければ先頭）"""
+    times = [c[0] for c in head["checkpoints"]]
+    i = bisect.bisect_right(times, at) - 1
+    return head["checkpoints"][i][1] if i >= 0 else 0
+
+
+def reconstruct(host: str, history_dir: str, at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    at 時点（省略時は最新）の report を復元する。at より前の記録が無ければ None。
+    直前のチェックポイントから読むので、コストはチェックポイント間隔ぶんで済む。
+    at が ISO 8601 として解釈できなければ ValueError。
+    """
+    at_epoch = _parse_time(at) if at is not None else None
+    log_path, head_path = _paths(history_dir, host)
+    head = _load_head(log_path, head_path)
+    if at_epoch is None:
+        if head["t"] is None:
+            return None
+        return {**head["state"], _TIME_FIELD: head["t"]}
+
+    state: Optional[Dict[str, Any]] = None
+    t = None
+    for _offset, rec in _iter_log(log_path, _checkpoint_offset(head, at_epoch)):
+        if _epoch(rec.get("t")) > at_epoch:
+            break
+        state = _apply(state or {}, rec)
+        t = rec.get("t")
+    if state is None:
+        return None
+    return {**state, _TIME_FIELD: t}
+
+
+def changes(
+    host: str,
+    history_dir: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    since より後〜until 以前に変わった項目だけを {"t", "set", "unset"} で順に返す。
+    チェックポイントは直前の状態との差分に直して返す。
+    since / until が ISO 8601 として解釈できなければ ValueError。
+    """
+    since_epoch = _parse_time(since) if since else -math.inf
+    until_epoch = _parse_time(until) if until else math.inf
+    return _changes(host, history_dir, since_epoch, until_epoch)
+
+
+def _changes(host: str, history_dir: str, since_epoch: float, until_epoch: float) -> Iterator[Dict[str, Any]]:
+    log_path, head_path = _paths(history_dir, host)
+    head = _load_head(log_path, head_path)
+
+    state: Dict[str, Any] = {}
+    start = _checkpoint_offset(head, since_epoch) if since_epoch > -math.inf else 0
+    for _offset, rec in _iter_log(log_path, start):
+        t_epoch = _epoch(rec.get("t"))
+        if t_epoch > until_epoch:
+            break
+        new_state = _apply(state, rec)
+        if t_epoch > since_epoch:
+            changed, removed = _diff(state, new_state)
+            if changed or removed:
+                out: Dict[str, Any] = {"t": rec.get("t"), "set": changed}
+                if removed:
+                    out["unset"] = removed
+                yield out
+        state = new_state
+
+
+# ============================
+# CLI
+# ============================
+
+def _iso_arg(value: str) -> str:
+    try:
+        _parse_time(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="envsnap スナップショット履歴（差分記録）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_append = sub.add_parser("append", help="collect() の結果を履歴に追記する")
+    p_append.add_argument("--dir", required=True, help="履歴のディレクトリ")
+
+    p_show = sub.add_parser("show", help="ある時点の report を復元して表示する")
+    p_show.add_argument("host")
+    p_show.add_argument("--dir", required=True, help="履歴のディレクトリ")
+    p_show.add_argument("--at", type=_iso_arg, help="時点（ISO 8601）。省略時は最新")
+    p_show.add_argument("--format", choices=["json", "text"], default="text")
+
+    p_changes = sub.add_parser("changes", help="変わった項目だけを NDJSON で表示する")
+    p_changes.add_argument("host")
+    p_changes.add_argument("--dir", required=True, help="履歴のディレクトリ")
+    p_changes.add_argument("--since", type=_iso_arg, help="この時点より後（ISO 8601）")
+    p_changes.add_argument("--until", type=_iso_arg, help="この時点以前（ISO 8601）")
+
+    args = parser.parse_args()
+
+    if args.command == "append":
+        from collect import collect
+
+        rec = append(collect(), args.dir)
+        if rec is None:
+            print("no change")
+        elif "full" in rec:
+            print("checkpoint")
+        else:
+            print("changed:", ", ".join(sorted(rec["set"]) + rec.get("unset", [])))
+        return 0
+
+    if args.command == "show":
+        report = reconstruct(args.host, args.dir, at=args.at)
+        if report is None:
+            print("（記録なし）", file=sys.stderr)
+            return 1
+        print(to_json(report) if args.format == "json" else to_text(report), end="")
+        return 0
+
+    for rec in changes(args.host, args.dir, since=args.since, until=args.until):
+        sys.stdout.write(json.dumps(rec, ensure_ascii=False, sort_keys=True) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
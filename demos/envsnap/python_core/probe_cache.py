@@ -0,0 +1,124 @@
+# envsnap/python_core/probe_cache.py
+#
+# CPU / 機種 / メモリ / GPU のような「ほぼ変わらない」項目のキャッシュ。
+# ユーザーのキャッシュディレクトリに JSON で保存し、ホスト名 + 起動 ID が一致し、
+# かつ項目ごとの TTL 内であれば外部コマンドを起動せずに再利用する。
+#
+# ポリシー上、起動 ID（Linux では UUID）はそのまま保存せず、ホスト名と合わせたハッシュだけを持つ。
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+CACHE_VERSION = 1
+CACHE_FILE = "probes.json"
+
+# 項目ごとの有効期限（秒）
+FIELD_TTL: Dict[str, float] = {
+    "cpu": 30 * 24 * 3600,
+    "device_model": 30 * 24 * 3600,
+    "memory_gb": 7 * 24 * 3600,
+    "gpus": 24 * 3600,
+}
+
+
+def cache_dir() -> str:
+    """OS ごとのユーザーキャッシュディレクトリ（ENVSNAP_CACHE_DIR で上書き可）"""
+    override = os.environ.get("ENVSNAP_CACHE_DIR", "").strip()
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "envsnap")
+
+
+def _boot_id() -> str:
+    """
+    起動ごとに変わる値。Linux は boot_id、それ以外は「現在時刻 - 起動からの経過時間」を分単位に丸めたもの。
+    （スリープ等で推定がずれた場合はキャッシュが外れるだけで、誤った値は返さない）
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r", encoding="ascii") as f:
+            value = f.read().strip()
+            if value:
+                return value
+    except OSError:
+        pass
+
+    try:
+        uptime = time.clock_gettime(time.CLOCK_MONOTONIC)
+    except (AttributeError, OSError):
+        uptime = time.monotonic()
+    return str(int((time.time() - uptime) // 60))
+
+
+def cache_key(hostname: str) -> str:
+    raw = f"{hostname}\0{_boot_id()}".encode("utf-8", errors="replace")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _path() -> str:
+    return os.path.join(cache_dir(), CACHE_FILE)
+
+
+def _read_entries(key: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(_path(), "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(doc, dict) or doc.get("version") != CACHE_VERSION or doc.get("key") != key:
+        return {}
+    fields = doc.get("fields")
+    return fields if isinstance(fields, dict) else {}
+
+
+def load(hostname: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """TTL 内のキャッシュ済み項目を {フィールド名: 値} で返す"""
+    now = time.time() if now is None else now
+    fresh: Dict[str, Any] = {}
+    for name, entry in _read_entries(cache_key(hostname)).items():
+        ttl = FIELD_TTL.get(name)
+        if ttl is None or not isinstance(entry, dict):
+            continue
+        at = entry.get("at")
+        if isinstance(at, (int, float)) and 0 <= now - at <= ttl:
+            fresh[name] = entry.get("value")
+    return fresh
+
+
+def store(hostname: str, values: Dict[str, Any], now: Optional[float] = None) -> None:
+    """
+    取得できた静的項目を保存する。None（未取得）は保存しない（次回また取りに行く）。
+    書き込みに失敗しても収集自体は続けたいので例外は握りつぶす。
+    """
+    now = time.time() if now is None else now
+    key = cache_key(hostname)
+    fields = _read_entries(key)
+    for name, value in values.items():
+        if name in FIELD_TTL and value is not None:
+            fields[name] = {"value": value, "at": now}
+    if not fields:
+        return
+
+    path = _path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            json.dump({"version": CACHE_VERSION, "key": key, "fields": fields}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
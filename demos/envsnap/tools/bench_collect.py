@@ -0,0 +1,121 @@
+# envsnap/tools/bench_collect.py
+#
+# collect() を fake_probe.py（遅延付きのスタンドイン）に対して繰り返し実行し、
+# 全体の所要時間とプローブごとの所要時間・結果を集計するベンチマーク。
+# プローブのスケジューリング（並行 / 逐次、締め切り）の変更で遅くなっていないかを確かめる用途。
+#
+#   python tools/bench_collect.py --system Darwin --delay 0.2 --delay system_profiler=1.0
+#   python tools/bench_collect.py --system Darwin --delay 0.2 --max-workers 1     # 逐次実行と比較
+#   python tools/bench_collect.py --system Windows --delay powershell=0.5 --budget-ms 800
+#
+# キャッシュは使わない（毎回すべてのプローブを実行する）。
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from typing import Any, Dict, List
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_CORE_DIR = os.path.join(os.path.dirname(_THIS_DIR), "python_core")
+if _CORE_DIR not in sys.path:
+    sys.path.insert(0, _CORE_DIR)
+
+from collect import collect, join_command  # noqa: E402
+
+_FAKE_TOOLS = ("powershell", "sysctl", "system_profiler")
+
+
+def _install_stand_ins(delays: List[str]) -> None:
+    """collect が起動する外部コマンドを fake_probe.py に差し替え、遅延を設定する"""
+    fake = os.path.join(_THIS_DIR, "fake_probe.py")
+    for tool in _FAKE_TOOLS:
+        os.environ[f"ENVSNAP_{tool.upper()}"] = join_command([sys.executable, fake, tool])
+    for spec in delays:
+        tool, sep, seconds = spec.rpartition("=")
+        if not sep:
+            os.environ["ENVSNAP_FAKE_DELAY"] = seconds
+        else:
+            os.environ[f"ENVSNAP_FAKE_DELAY_{tool.upper()}"] = seconds
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(values), 1),
+        "median": round(statistics.median(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def run(runs: int, system: str, timeout: float, max_workers: int) -> Dict[str, Any]:
+    totals: List[float] = []
+    per_probe: Dict[str, List[float]] = {}
+    outcomes: Dict[str, Dict[str, int]] = {}
+
+    for _ in range(runs):
+        report = collect(
+            timeout=timeout,
+            use_cache=False,
+            timings=True,
+            system=system,
+            max_workers=max_workers or None,
+        )
+        t = report["timings"]
+        totals.append(t["total_ms"])
+        for name, probe in t["probes"].items():
+            per_probe.setdefault(name, []).append(probe["ms"])
+            counts = outcomes.setdefault(name, {})
+            counts[probe["outcome"]] = counts.get(probe["outcome"], 0) + 1
+
+    return {
+        "system": system,
+        "runs": runs,
+        "max_workers": max_workers or None,
+        "total_ms": _summary(totals),
+        "probes": {
+            name: {"ms": _summary(values), "outcomes": outcomes[name]}
+            for name, values in sorted(per_probe.items())
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="collect() のベンチマーク（スタンドインのプローブ使用）")
+    parser.add_argument("--system", choices=["Windows", "Darwin", "Linux"], default="Darwin", help="想定する OS")
+    parser.add_argument("--runs", type=int, default=5, help="繰り返し回数")
+    parser.add_argument(
+        "--delay",
+        action="append",
+        default=[],
+        metavar="[TOOL=]SECONDS",
+        help="スタンドインの応答遅延（TOOL は powershell / sysctl / system_profiler。複数指定可）",
+    )
+    parser.add_argument("--timeout", type=float, default=10.0, help="collect() の締め切り（秒）")
+    parser.add_argument("--max-workers", type=int, default=0, help="プローブの同時実行数（0 = プローブ数、1 = 逐次）")
+    parser.add_argument("--budget-ms", type=float, help="全体の中央値がこれを超えたら終了コード 1")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    args = parser.parse_args()
+
+    _install_stand_ins(args.delay)
+    result = run(args.runs, args.system, args.timeout, args.max_workers)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        total = result["total_ms"]
+        print(f"{args.system} x{args.runs}  total ms: min {total['min']} / median {total['median']} / max {total['max']}")
+        for name, probe in result["probes"].items():
+            ms = probe["ms"]
+            outcomes = ", ".join(f"{k}={v}" for k, v in sorted(probe["outcomes"].items()))
+            print(f"  {name:<14} median {ms['median']:>8} ms  (min {ms['min']}, max {ms['max']})  {outcomes}")
+
+    if args.budget_ms is not None and result["total_ms"]["median"] > args.budget_ms:
+        print(f"NG: median {result['total_ms']['median']} ms > budget {args.budget_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+# envsnap/tools/check_collect_windows.py
+#
+# Windows の収集経路（_run_ps → _parse_windows_cim）を fake_probe.py に対して実行し、
+# 取り出したフィールドを確かめるセルフチェック。Windows 以外でも動く。
+# 1 つでも期待と違えば終了コード 1。
+#
+#   python tools/check_collect_windows.py
+#   python tools/check_collect_windows.py -v       # ケースごとの結果を表示
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_CORE_DIR = os.path.join(os.path.dirname(_THIS_DIR), "python_core")
+if _CORE_DIR not in sys.path:
+    sys.path.insert(0, _CORE_DIR)
+
+import collect  # noqa: E402
+
+_EMPTY = {"cpu": None, "device_model": None, "memory_gb": None, "gpus": None}
+
+_DEFAULT = {
+    "cpu": "Intel(R) Core(TM) i7-10700 CPU @ 2.90GHz",
+    "device_model": "Fake Model 1000",
+    "memory_gb": 16.0,
+    "gpus": ["NVIDIA GeForce RTX 3060", "Intel(R) UHD Graphics 630"],
+}
+
+# (ケース名, fake_probe の環境変数, collect の締め切り（秒）, 期待するフィールド)
+_CASES: List[Tuple[str, Dict[str, str], Optional[float], Dict[str, Any]]] = [
+    ("default", {}, None, _DEFAULT),
+    (
+        "single gpu string",
+        {"ENVSNAP_FAKE_PS_OUTPUT": json.dumps({**_DEFAULT, "memory_bytes": 8589934592, "gpus": "Microsoft Basic Display Adapter"})},
+        None,
+        {**_DEFAULT, "memory_gb": 8.0, "gpus": ["Microsoft Basic Display Adapter"]},
+    ),
+    (
+        "warning before json",
+        {"ENVSNAP_FAKE_PS_OUTPUT": "WARNING: something\n" + json.dumps({"cpu": "  Fake   CPU  ", "gpus": []})},
+        None,
+        {**_EMPTY, "cpu": "Fake CPU"},
+    ),
+    ("bad json", {"ENVSNAP_FAKE_PS_OUTPUT": "garbage"}, None, _EMPTY),
+    ("json array", {"ENVSNAP_FAKE_PS_OUTPUT": "[1, 2, 3]"}, None, _EMPTY),
+    ("non-zero exit", {"ENVSNAP_FAKE_EXIT": "1"}, None, _EMPTY),
+    ("timeout", {"ENVSNAP_FAKE_DELAY": "3"}, 0.5, {}),
+]
+
+_FAKE_ENV = ("ENVSNAP_FAKE_PS_OUTPUT", "ENVSNAP_FAKE_EXIT", "ENVSNAP_FAKE_DELAY", "ENVSNAP_FAKE_DELAY_POWERSHELL")
+
+
+def _run_case(env: Dict[str, str], timeout: Optional[float]) -> Dict[str, Any]:
+    for name in _FAKE_ENV:
+        os.environ.pop(name, None)
+    os.environ.update(env)
+    if timeout is None:
+        return collect._collect_windows()
+    return collect._collect_windows(timeout=timeout)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Windows の収集経路を fake_probe.py で確認する")
+    parser.add_argument("-v", "--verbose", action="store_true", help="ケースごとの結果を表示する")
+    args = parser.parse_args()
+
+    fake = os.path.join(_THIS_DIR, "fake_probe.py")
+    os.environ["ENVSNAP_POWERSHELL"] = collect.join_command([sys.executable, fake, "powershell"])
+
+    failures = 0
+    for name, env, timeout, expected in _CASES:
+        got = _run_case(env, timeout)
+        ok = got == expected
+        if not ok:
+            failures += 1
+            print(f"NG: {name}\n  expected: {expected}\n  got:      {got}", file=sys.stderr)
+        elif args.verbose:
+            print(f"ok: {name}")
+
+    if failures:
+        print(f"{failures}/{len(_CASES)} ケースが失敗しました", file=sys.stderr)
+        return 1
+    print(f"OK ({len(_CASES)} ケース)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+# envsnap/tools/fake_probe.py
+#
+# powershell / sysctl / system_profiler の代わりに起動するスタンドイン。
+# 実機が無い環境でも collect のプローブ経路を動かしたり、遅延を付けてベンチマークしたりするためのもの。
+# 第 1 引数でどのコマンドとして振る舞うかを指定し、残りは本物と同じ引数を受け取る。
+#
+#   ENVSNAP_POWERSHELL="python tools/fake_probe.py powershell"
+#   ENVSNAP_SYSCTL="python tools/fake_probe.py sysctl"
+#   ENVSNAP_SYSTEM_PROFILER="python tools/fake_probe.py system_profiler"
+#
+# 環境変数:
+#   ENVSNAP_FAKE_DELAY          … 応答までの待ち時間（秒、全コマンド共通）
+#   ENVSNAP_FAKE_DELAY_<TOOL>   … コマンドごとの待ち時間（例: ENVSNAP_FAKE_DELAY_SYSTEM_PROFILER=2）
+#   ENVSNAP_FAKE_PS_OUTPUT      … powershell が標準出力に書く内容（省略時は下の固定 JSON）
+#   ENVSNAP_FAKE_EXIT           … 終了コード（既定 0）
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+_DEFAULT_PS_DOC = {
+    "cpu": "Intel(R) Core(TM) i7-10700 CPU @ 2.90GHz",
+    "device_model": "Fake Model 1000",
+    "memory_bytes": 17179869184,
+    "gpus": ["NVIDIA GeForce RTX 3060", "Intel(R) UHD Graphics 630"],
+}
+
+_SYSCTL_VALUES = {
+    "hw.model": "MacBookPro18,3",
+    "hw.memsize": "17179869184",
+    "machdep.cpu.brand_string": "Apple M1 Pro",
+}
+
+_SYSTEM_PROFILER_DISPLAYS = """Graphics/Displays:
+
+    Apple M1 Pro:
+
+      Chipset Model: Apple M1 Pro
+      Type: GPU
+      Bus: Built-In
+"""
+
+
+def _powershell(argv: List[str]) -> Optional[str]:
+    # 実物と同じく -NoProfile -Command <script> で呼ばれる前提
+    if "-Command" not in argv or argv.index("-Command") + 1 >= len(argv):
+        return None
+    output = os.environ.get("ENVSNAP_FAKE_PS_OUTPUT")
+    return json.dumps(_DEFAULT_PS_DOC) if output is None else output
+
+
+def _sysctl(argv: List[str]) -> Optional[str]:
+    keys = [a for a in argv if not a.startswith("-")]
+    if not keys or any(k not in _SYSCTL_VALUES for k in keys):
+        return None
+    return "\n".join(_SYSCTL_VALUES[k] for k in keys)
+
+
+def _system_profiler(argv: List[str]) -> Optional[str]:
+    return _SYSTEM_PROFILER_DISPLAYS if "SPDisplaysDataType" in argv else ""
+
+
+_TOOLS = {
+    "powershell": _powershell,
+    "sysctl": _sysctl,
+    "system_profiler": _system_profiler,
+}
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] not in _TOOLS:
+        print(f"usage: fake_probe.py {{{','.join(_TOOLS)}}} [args...]", file=sys.stderr)
+        return 2
+    tool, args = argv[0], argv[1:]
+
+    delay = os.environ.get(f"ENVSNAP_FAKE_DELAY_{tool.upper()}") or os.environ.get("ENVSNAP_FAKE_DELAY")
+    if delay:
+        time.sleep(float(delay))
+
+    output = _TOOLS[tool](args)
+    if output is None:
+        print(f"fake_probe: {tool}: 想定外の引数です: {args}", file=sys.stderr)
+        return 1
+    sys.stdout.write(output + "\n")
+    return int(os.environ.get("ENVSNAP_FAKE_EXIT", "0"))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))